@@ -1,12 +1,203 @@
+import io
+import json
+import logging
 import os
 import re
+import sys
+import hashlib
 import boto3
-from functools import lru_cache
-from typing import Dict, List, Any
+from botocore.config import Config
+from botocore.exceptions import ClientError, BotoCoreError
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Dict, List, Any, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+# Use absolute import to avoid module structure issues
+try:
+    from backend.ttl_cache import TTLCache
+    from backend.utils import PUNCT_RE, PUNCT_TABLE
+except ImportError:
+    # Fallback for direct script execution
+    from ttl_cache import TTLCache
+    from utils import PUNCT_RE, PUNCT_TABLE
+
+logger = logging.getLogger(__name__)
+
+# Acronym expansions applied by preprocess_query
+_ACRONYMS = {
+    sys.intern(acronym): sys.intern(full_form)
+    for acronym, full_form in {
+        "lpu": "LPU",
+        "cse": "computer science engineering",
+        "ece": "electronics and communication engineering",
+        "ai": "artificial intelligence",
+        "ml": "machine learning"
+    }.items()
+}
+
+# Patterns are compiled once at import time rather than on every query
+_ACRONYM_RE = re.compile(r'\b(' + '|'.join(map(re.escape, _ACRONYMS)) + r')\b')
+_URL_RE = re.compile(r'https?://[\w.-]+(?:\.[\w.-]+)+[\w\-._~:/?#[\]@!$&\'()*+,;=]+')
+_HTTP_SCHEMES = ('http://', 'https://')
+
+# URLs recur across results and are parsed again by validation and titling;
+# ParseResult is an immutable namedtuple, so parses can be shared safely
+_cached_urlparse = lru_cache(maxsize=1024)(urlparse)
+
+
+def _expand_acronym(match: re.Match) -> str:
+    return _ACRONYMS[match.group(1)]
+
+
+def _compile_synonym_pattern(synonyms: Dict[str, List[str]]) -> Optional[re.Pattern]:
+    """Compile one alternation over all synonym keys for a single-pass scan."""
+    if not synonyms:
+        return None
+    # Longest keys first so multi-word keys win over their prefixes
+    keys = sorted(synonyms, key=len, reverse=True)
+    return re.compile(r'\b(' + '|'.join(map(re.escape, keys)) + r')\b')
+
+
+# Synonym expansions applied by expand_query. Built once per process, with
+# keys and replacements interned since they are reused for every query.
+_SYNONYMS = {
+    sys.intern(term): [sys.intern(synonym) for synonym in synonyms]
+    for term, synonyms in {
+        "lpu": ["lovely professional university", "lpu university", "lovely university"],
+        "fee": ["fees", "tuition", "cost", "payment"],
+        "admission": ["admissions", "enrollment", "joining", "application"],
+        "course": ["program", "degree", "curriculum", "study"],
+    }.items()
+}
+_SYNONYM_RE = _compile_synonym_pattern(_SYNONYMS)
+
+
+# Shared botocore client configuration: keep enough pooled connections for
+# concurrent requests, keep idle sockets alive so pooled TLS connections are
+# reused, and retry transient failures
+_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    retries={"max_attempts": 3}
+)
+
+
+@lru_cache(maxsize=4)
+def _get_aws_clients(region: str, access_key: Optional[str] = None, secret_key: Optional[str] = None) -> Tuple[Any, Any, Any]:
+    """Create (or reuse) a boto3 session with its Bedrock and S3 clients.
+
+    Building a session and its clients loads and parses the botocore service
+    models, so the result is cached per region and credential pair and shared
+    by every retriever instance.
+    """
+    if access_key and secret_key:
+        session = boto3.Session(
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name=region
+        )
+    else:
+        session = boto3.Session(region_name=region)
+
+    bedrock_client = session.client("bedrock-agent-runtime", config=_CLIENT_CONFIG)
+    s3_client = session.client("s3", config=_CLIENT_CONFIG)
+    return session, bedrock_client, s3_client
+
+
+# Worker pool for fanning out independent Bedrock/S3 calls. boto3 clients are
+# thread-safe and these calls are I/O-bound, so threads overlap their latency.
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="bedrock-retriever")
+
+# Successful Bedrock responses, shared by all retriever instances and keyed on
+# (kb_id, num_results, normalized query) so a new retriever starts warm. When a
+# Redis client is supplied, responses are also shared across worker processes.
+_RETRIEVAL_CACHE_TTL = 900
+_RETRIEVAL_CACHE = TTLCache(maxsize=512, ttl=_RETRIEVAL_CACHE_TTL)
+_RETRIEVAL_REDIS_PREFIX = "retrieval:"
+
+# Merged advanced-retrieval results per raw query, so a repeated question skips
+# preprocessing, expansion and the per-variation lookups entirely
+_MERGED_CACHE_TTL = 300
+
+
+class _UrlRecord(NamedTuple):
+    """A reference URL found in a retrieval result and where it was found.
+
+    A plain tuple underneath, so records unpack like the (url, title, source)
+    triples callers already use, without a per-instance dict.
+    """
+    url: str
+    title: str
+    source: str
+
+
+# Location types whose structured location carries a web URL, mapped to the
+# (location field, URL key) holding it
+_LOCATION_URL_FIELDS = {
+    "WEB": ("webLocation", "url"),
+}
+
+
+# Header line written for each result by format_retrieval_results
+_SOURCE_LINE_FMT = "SOURCE %d [Score: %s]"
+
+
+# Presigned URLs, keyed on (bucket, key), are reused until shortly before they
+# expire so a document referenced by several results or queries is signed once
+_PRESIGNED_URL_EXPIRY = 3600
+_PRESIGNED_URL_CACHE = TTLCache(maxsize=1024, ttl=_PRESIGNED_URL_EXPIRY - 300)
+
+
+@lru_cache(maxsize=256)
+def _normalize_domain(domain: str) -> Tuple[str, str]:
+    """Return the lowercased domain without 'www.' and its '.'-prefixed subdomain suffix."""
+    domain = domain.lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return domain, '.' + domain
+
+def _domain_matches(netloc: str, institution_domain: str) -> Tuple[bool, str, str]:
+    """Strictly match a URL's netloc against the institution domain.
+
+    Only the exact domain or its subdomains match, ignoring case and a leading
+    'www.'. Returns (is_valid, normalized netloc, normalized institution domain).
+    """
+    domain = _normalize_domain(netloc)[0]
+    norm_institution_domain, institution_suffix = _normalize_domain(institution_domain)
+    is_valid = domain == norm_institution_domain or domain.endswith(institution_suffix)
+    return is_valid, domain, norm_institution_domain
+
+def _content_fingerprint(content: str) -> bytes:
+    """Stable, process-independent fingerprint of a result's text for dedupe.
+
+    Whitespace is collapsed first so snippets that differ only in spacing or
+    trailing newlines count as duplicates. The 128-bit digest is safe to
+    persist alongside cached responses and compare across workers.
+    """
+    return hashlib.blake2b(" ".join(content.split()).encode("utf-8"), digest_size=16).digest()
+
+
+def _retrieval_cache_key(kb_id: str, num_results: int, query: str) -> Tuple[str, int, str]:
+    return kb_id, num_results, " ".join(query.lower().split())
+
+
+def _retrieval_redis_key(cache_key: Tuple[str, int, str]) -> str:
+    digest = hashlib.blake2b("\x1f".join(map(str, cache_key)).encode("utf-8"), digest_size=12).hexdigest()
+    return f"{_RETRIEVAL_REDIS_PREFIX}{digest}"
+
+
+def _copy_response(response: Dict) -> Dict:
+    """Copy a cached response and its results list so callers cannot alter the cached entry."""
+    return {**response, "retrievalResults": list(response.get("retrievalResults", []))}
+
 
 class EnhancedBedrockRetriever:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], redis_client: Any = None):
         self.config = config
+        # Optional Redis client used as a second-level retrieval cache
+        self.redis_client = redis_client
+        self._merged_cache = TTLCache(maxsize=256, ttl=_MERGED_CACHE_TTL)
 
         # Get AWS configuration from config
         self.kb_id = config["aws"]["s3_kb_id"]
@@ -17,90 +208,135 @@ class EnhancedBedrockRetriever:
         self.num_results = config["retrieval"]["num_results"]
         self.min_score = config["retrieval"]["min_score"]
 
-        # Create session based on authentication method
+        # Retrieval caching follows the global cache switch
+        self.cache_enabled = config.get("cache", {}).get("enabled", True)
+
+        # Built once and passed to every Bedrock retrieve call
+        self._retrieval_configuration = {
+            "vectorSearchConfiguration": {
+                "numberOfResults": self.num_results
+            }
+        }
+
+        # Resolve credentials based on authentication method
+        access_key = secret_key = None
         if self.auth_method.lower() == "iam_role":
             # Use IAM role authentication (default credential provider chain)
-            self.session = boto3.Session(region_name=self.region)
-            print(f"Using IAM role authentication for AWS services")
+            logger.info("Using IAM role authentication for AWS services")
         else:
             # Use explicit credentials
             self.access_key = config["aws"].get("access_key")
             self.secret_key = config["aws"].get("secret_key")
 
             if not self.access_key or not self.secret_key:
-                print(f"Warning: Missing AWS credentials but auth_method is '{self.auth_method}'. Falling back to IAM role.")
-                self.session = boto3.Session(region_name=self.region)
+                logger.warning(f"Missing AWS credentials but auth_method is '{self.auth_method}'. Falling back to IAM role.")
             else:
-                self.session = boto3.Session(
-                    aws_access_key_id=self.access_key,
-                    aws_secret_access_key=self.secret_key,
-                    region_name=self.region
-                )
-                print(f"Using credential-based authentication for AWS services")
-
-        self.bedrock_client = self.session.client("bedrock-agent-runtime")
-        self.s3_client = self.session.client("s3")
-
-        self.synonyms = {
-            "lpu": ["lovely professional university", "lpu university", "lovely university"],
-            "fee": ["fees", "tuition", "cost", "payment"],
-            "admission": ["admissions", "enrollment", "joining", "application"],
-            "course": ["program", "degree", "curriculum", "study"],
-        }
+                access_key, secret_key = self.access_key, self.secret_key
+                logger.info("Using credential-based authentication for AWS services")
+
+        self.session, self.bedrock_client, self.s3_client = _get_aws_clients(self.region, access_key, secret_key)
+
+        # Per-instance copy of the interned table, so customizing one retriever's
+        # synonyms cannot leak into others; the matcher is rebuilt whenever the keys change
+        self.synonyms = {term: list(synonyms) for term, synonyms in _SYNONYMS.items()}
+        self._synonym_keys = tuple(_SYNONYMS)
+        self._synonym_re = _SYNONYM_RE
 
     def preprocess_query(self, query: str) -> str:
-        processed = query.lower().strip()
-        acronyms = {
-            "lpu": "LPU",
-            "cse": "computer science engineering",
-            "ece": "electronics and communication engineering",
-            "ai": "artificial intelligence",
-            "ml": "machine learning"
-        }
-        for acronym, full_form in acronyms.items():
-            pattern = r'\b' + re.escape(acronym) + r'\b'
-            processed = re.sub(pattern, full_form, processed)
-        processed = re.sub(r'\s+', ' ', processed)
-        processed = re.sub(r'[^\w\s]', '', processed)
-        return processed
-
-    def expand_query(self, query: str) -> List[str]:
-        query_terms = query.split()
+        processed = _ACRONYM_RE.sub(_expand_acronym, query.lower().strip())
+        processed = ' '.join(processed.split())
+        if processed.isascii():
+            return processed.translate(PUNCT_TABLE)
+        return PUNCT_RE.sub('', processed)
+
+    def _synonym_matcher(self) -> Optional[re.Pattern]:
+        """Return the matcher for the current synonym keys, recompiling if they changed."""
+        # Keys are interned, so comparing against the last seen keys is cheap
+        keys = tuple(self.synonyms)
+        if keys != self._synonym_keys:
+            self._synonym_keys = keys
+            self._synonym_re = _compile_synonym_pattern(self.synonyms)
+        return self._synonym_re
+
+    def expand_query(self, query: str, max_variations: int = 3) -> List[str]:
         expanded_queries = [query]
-        for i, term in enumerate(query_terms):
-            if term in self.synonyms:
-                for synonym in self.synonyms[term]:
-                    new_query = query_terms.copy()
-                    new_query[i] = synonym
-                    expanded_queries.append(" ".join(new_query))
-        return expanded_queries[:3]
-
-    @lru_cache(maxsize=32)
+        matcher = self._synonym_matcher()
+        # One scan of the query finds every synonym key, including multi-word keys
+        for match in matcher.finditer(query) if matcher is not None else ():
+            left = query[:match.start()]
+            right = query[match.end():]
+            for synonym in self.synonyms.get(match.group(1), ()):
+                expanded_queries.append(f"{left}{synonym}{right}")
+                if len(expanded_queries) >= max_variations:
+                    return expanded_queries
+        return expanded_queries
+
+    def _get_shared_cached_response(self, cache_key: Tuple[str, int, str]) -> Optional[Dict]:
+        """Look up a retrieval response in the Redis cache, if one is configured."""
+        if self.redis_client is None:
+            return None
+        try:
+            data = self.redis_client.get(_retrieval_redis_key(cache_key))
+            if data:
+                # If Redis client has decode_responses=True, data is already a string
+                if isinstance(data, bytes):
+                    data = data.decode('utf-8')
+                return json.loads(data)
+        except Exception as e:
+            logger.error(f"Error reading retrieval cache from Redis: {e}")
+        return None
+
+    def _set_shared_cached_response(self, cache_key: Tuple[str, int, str], response: Dict) -> None:
+        """Store a retrieval response in the Redis cache, if one is configured."""
+        if self.redis_client is None:
+            return
+        try:
+            payload = json.dumps(response, default=str)
+            self.redis_client.setex(_retrieval_redis_key(cache_key), _RETRIEVAL_CACHE_TTL, payload)
+        except Exception as e:
+            logger.error(f"Error writing retrieval cache to Redis: {e}")
+
     def cached_retrieve(self, query: str) -> Dict:
-        """Retrieve from Bedrock knowledge base with caching."""
-        import logging
-        import boto3
-        from botocore.exceptions import ClientError, BotoCoreError
+        """Retrieve from Bedrock knowledge base with caching.
+
+        Successful responses are kept in a module-level TTL cache and, when a
+        Redis client is configured, in Redis so other workers can reuse them.
+        Error responses are never cached so transient failures are retried,
+        and nothing is cached when caching is disabled in the config.
+        """
+        cache_key = _retrieval_cache_key(self.kb_id, self.num_results, query)
+        if self.cache_enabled:
+            cached = _RETRIEVAL_CACHE.get(cache_key)
+            if cached is not None:
+                return _copy_response(cached)
+
+            cached = self._get_shared_cached_response(cache_key)
+            if cached is not None:
+                _RETRIEVAL_CACHE.set(cache_key, cached)
+                return _copy_response(cached)
 
         try:
             # Remove the filters parameter since customer_id is undefined
-            response = self.bedrock_client.retrieve(
+            raw_response = self.bedrock_client.retrieve(
                 knowledgeBaseId=self.kb_id,
                 retrievalQuery={
                     "text": query
                     # Removed filters with undefined customer_id
                 },
-                retrievalConfiguration={
-                    "vectorSearchConfiguration": {
-                        "numberOfResults": self.num_results
-                    }
-                }
+                retrievalConfiguration=self._retrieval_configuration
             )
+            # Keep only the results; response metadata and headers are never read
+            # and would otherwise be held in the caches
+            response = {"retrievalResults": raw_response.get("retrievalResults", [])}
+            if self.cache_enabled:
+                _RETRIEVAL_CACHE.set(cache_key, response)
+                self._set_shared_cached_response(cache_key, response)
+                return _copy_response(response)
             return response
         except ClientError as e:
             error_code = e.response.get("Error", {}).get("Code", "Unknown")
             error_msg = e.response.get("Error", {}).get("Message", str(e))
-            logging.error(f"AWS Bedrock ClientError: {error_code} - {error_msg}")
+            logger.error(f"AWS Bedrock ClientError: {error_code} - {error_msg}")
 
             if error_code == "ThrottlingException":
                 return {"error": "AWS service is currently busy. Please try again shortly.", "retrievalResults": []}
@@ -109,140 +345,148 @@ class EnhancedBedrockRetriever:
             else:
                 return {"error": f"AWS error: {error_msg}", "retrievalResults": []}
         except BotoCoreError as e:
-            logging.error(f"AWS BotoCoreError: {str(e)}")
+            logger.error(f"AWS BotoCoreError: {str(e)}")
             return {"error": f"AWS connection error: {str(e)}", "retrievalResults": []}
         except Exception as e:
-            logging.error(f"Unexpected error in Bedrock retrieval: {str(e)}")
+            logger.error(f"Unexpected error in Bedrock retrieval: {str(e)}")
             return {"error": f"Retrieval error: {str(e)}", "retrievalResults": []}
 
-    def retrieve(self, query: str, advanced: bool = True, debug: bool = True) -> Dict:
+    def retrieve(self, query: str, advanced: bool = True, debug: bool = False) -> Dict:
         """Retrieve content from knowledge base, with optional query expansion."""
-        import logging
-        import json
-
-        # Setup logging if not already configured
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        if advanced and self.cache_enabled:
+            merged = self._merged_cache.get(query)
+            if merged is not None:
+                logger.info(f"Merged retrieval cache hit for query: '{query}'")
+                return _copy_response(merged)
 
         try:
             # Preprocess the query
             processed_query = self.preprocess_query(query)
-            logging.info(f"Processed query: '{processed_query}'")
+            logger.info(f"Processed query: '{processed_query}'")
 
             if advanced:
                 # Use query expansion for advanced mode
                 query_variations = self.expand_query(processed_query)
-                logging.info(f"Query variations: {query_variations}")
+                logger.info(f"Query variations: {query_variations}")
 
                 all_results = []
-                seen_texts = set()
+                seen_digests = set()
                 error_count = 0
 
-                for query_var in query_variations:
+                if len(query_variations) > 1:
+                    # Issue all variation lookups concurrently, then merge in order
+                    fetchers = []
+                    for query_var in query_variations:
+                        logger.info(f"Retrieving for query variation: '{query_var}'")
+                        fetchers.append(_EXECUTOR.submit(self.cached_retrieve, query_var).result)
+                else:
+                    # No synonyms matched: nothing to overlap, so skip the thread hop
+                    logger.info(f"Retrieving for query: '{processed_query}'")
+                    fetchers = [partial(self.cached_retrieve, processed_query)]
+
+                for query_var, fetch_response in zip(query_variations, fetchers):
                     try:
-                        logging.info(f"Retrieving for query variation: '{query_var}'")
-                        response = self.cached_retrieve(query_var)
+                        response = fetch_response()
 
-                        if "error" in response:
+                        error_msg = response.get("error")
+                        if error_msg is not None:
                             error_count += 1
-                            logging.warning(f"Error in response for '{query_var}': {response.get('error')}")
+                            logger.warning(f"Error in response for '{query_var}': {error_msg}")
                             continue
 
-                        # Debug: Print the full response structure if debug mode is on
-                        if debug:
-                            try:
-                                # Convert to dict and back to JSON for pretty printing
-                                response_dict = {k: v for k, v in response.items() if k != 'retrievalResults'}
-                                response_dict['retrievalResults'] = f"[{len(response.get('retrievalResults', []))} results]"
-                                logging.info(f"Response structure for '{query_var}': {json.dumps(response_dict, indent=2)}")
-
-                                # Print the structure of the first result if available
-                                if response.get('retrievalResults'):
-                                    first_result = response['retrievalResults'][0]
-                                    first_result_dict = {k: (v if k != 'content' else '[content text]') for k, v in first_result.items()}
-                                    logging.info(f"First result structure: {json.dumps(first_result_dict, indent=2)}")
-                            except Exception as e:
-                                logging.error(f"Error printing response structure: {str(e)}")
+                        # Debug: Log the response structure only when it will actually be emitted
+                        if debug and logger.isEnabledFor(logging.DEBUG):
+                            results = response.get('retrievalResults') or []
+                            logger.debug("Response for '%s': keys=%s results=%d", query_var, list(response), len(results))
+                            if results:
+                                logger.debug("First result keys: %s", list(results[0]))
 
-                        # Process results
+                        # Process results, stopping once enough unique results are
+                        # collected so the seen-set never outgrows num_results
                         for result in response.get("retrievalResults", []):
+                            if len(all_results) >= self.num_results:
+                                break
                             try:
                                 content = result.get("content", {}).get("text", "")
-                                content_hash = hash(content)
-                                if content_hash not in seen_texts:
-                                    seen_texts.add(content_hash)
+                                # Add first and compare sizes: one set probe per result
+                                seen_count = len(seen_digests)
+                                seen_digests.add(_content_fingerprint(content))
+                                if len(seen_digests) != seen_count:
                                     all_results.append(result)
                             except Exception as e:
-                                logging.error(f"Error processing result: {str(e)}")
+                                logger.error(f"Error processing result: {str(e)}")
                     except Exception as e:
                         error_count += 1
-                        logging.error(f"Error processing query variation '{query_var}': {str(e)}")
+                        logger.error(f"Error processing query variation '{query_var}': {str(e)}")
 
                 # Check if all queries failed
                 if error_count == len(query_variations):
-                    logging.error("All query variations failed")
+                    logger.error("All query variations failed")
                     return {"error": "All retrieval attempts failed", "retrievalResults": []}
 
-                logging.info(f"Total unique results after processing: {len(all_results)}")
-                return {"retrievalResults": all_results[:self.num_results]}
+                logger.info(f"Total unique results after processing: {len(all_results)}")
+                # The merge stops at num_results, so no slice copy is needed
+                merged = {"retrievalResults": all_results}
+                # Partial failures are not cached so the failed variations are retried
+                if self.cache_enabled and not error_count:
+                    self._merged_cache.set(query, merged)
+                    return _copy_response(merged)
+                return merged
 
             # Non-advanced mode - just use the processed query directly
             return self.cached_retrieve(processed_query)
 
         except Exception as e:
-            logging.error(f"Unexpected error in retrieve method: {str(e)}")
+            logger.error(f"Unexpected error in retrieve method: {str(e)}")
             return {"error": f"Retrieval processing error: {str(e)}", "retrievalResults": []}
 
     def get_presigned_url(self, s3_uri: str) -> str:
         """Generate a presigned URL for an S3 URI."""
-        import logging
-        import boto3
-        from botocore.exceptions import ClientError, BotoCoreError
-
         if not s3_uri.startswith('s3://'):
             return s3_uri
 
         try:
-            # Parse the S3 URI
-            parts = s3_uri.split('/')
-            if len(parts) < 4:
-                logging.error(f"Invalid S3 URI format: {s3_uri}")
+            # Parse the S3 URI in one pass; the key may itself contain '/', '?' or '#'
+            bucket, sep, key = s3_uri[5:].partition('/')
+            if not bucket or not sep:
+                logger.error(f"Invalid S3 URI format: {s3_uri}")
                 return s3_uri
 
-            bucket = parts[2]
-            key = '/'.join(parts[3:])
+            cached_url = _PRESIGNED_URL_CACHE.get((bucket, key))
+            if cached_url is not None:
+                return cached_url
 
             # Generate the presigned URL
             url = self.s3_client.generate_presigned_url(
                 'get_object',
                 Params={'Bucket': bucket, 'Key': key},
-                ExpiresIn=3600
+                ExpiresIn=_PRESIGNED_URL_EXPIRY
             )
-            logging.info(f"Generated presigned URL for {s3_uri}")
+            _PRESIGNED_URL_CACHE.set((bucket, key), url)
+            logger.info(f"Generated presigned URL for {s3_uri}")
             return url
 
         except ClientError as e:
             error_code = e.response.get("Error", {}).get("Code", "Unknown")
             error_msg = e.response.get("Error", {}).get("Message", str(e))
-            logging.error(f"AWS S3 ClientError: {error_code} - {error_msg}")
+            logger.error(f"AWS S3 ClientError: {error_code} - {error_msg}")
             return f"Error accessing document: {error_msg}"
 
         except BotoCoreError as e:
-            logging.error(f"AWS S3 BotoCoreError: {str(e)}")
+            logger.error(f"AWS S3 BotoCoreError: {str(e)}")
             return f"Error connecting to document storage: {str(e)}"
 
         except Exception as e:
-            logging.error(f"Unexpected error generating presigned URL for {s3_uri}: {str(e)}")
+            logger.error(f"Unexpected error generating presigned URL for {s3_uri}: {str(e)}")
             return f"Error generating URL: {str(e)}"
 
     def format_as_link(self, source_url: str) -> str:
         """Format a source URL as a markdown link."""
-        import logging
-
         if not source_url or source_url == 'Source URL not available':
             return "Source URL not available"
 
         try:
-            if source_url.startswith(('http://', 'https://')):
+            if source_url.startswith(_HTTP_SCHEMES):
                 # For web URLs, create a direct link
                 return f"[View Document]({source_url})"
             elif source_url.startswith('s3://'):
@@ -251,318 +495,271 @@ class EnhancedBedrockRetriever:
                 return f"[View Document]({presigned_url})"
             else:
                 # For other formats, return as is
-                logging.warning(f"Unknown URL format: {source_url}")
+                logger.warning(f"Unknown URL format: {source_url}")
                 return source_url
         except Exception as e:
-            logging.error(f"Error formatting link for {source_url}: {str(e)}")
+            logger.error(f"Error formatting link for {source_url}: {str(e)}")
             return source_url
 
-    def extract_urls_from_result(self, result: Dict, result_index: int, institution_domain: str) -> List[tuple]:
+    def _collect_metadata_urls(self, fields: Dict, source: str, result_index: int, result_urls: List[_UrlRecord]) -> None:
+        """Append every web URL found in a metadata mapping to result_urls.
+
+        Metadata keys are user-defined per knowledge base, so every value is
+        checked rather than a fixed list of key names.
+        """
+        title = None
+        for key, value in fields.items():
+            if not isinstance(value, str) or not value.startswith(_HTTP_SCHEMES):
+                continue
+            # Validate URL format
+            try:
+                if _cached_urlparse(value).netloc:  # Ensure it has a domain
+                    if title is None:
+                        title = fields.get('title', '')
+                    result_urls.append(_UrlRecord(value, title, f'{source}[{key}]'))
+                    logger.info(f"Result {result_index} - Found URL in {source}[{key}]: {value}")
+            except Exception:
+                logger.warning(f"Result {result_index} - Invalid URL in {source}[{key}]: {value}")
+
+    def extract_urls_from_result(self, result: Dict, result_index: int, institution_domain: str) -> List[_UrlRecord]:
         """Extract URLs from a single result, prioritizing structured metadata fields.
         Only extracts web links (http/https URLs).
         """
-        import logging
-        from urllib.parse import urlparse
-
         result_urls = []
 
         try:
             # 1. First priority: Check location (most reliable structured field)
             location = result.get('location', {})
-            location_type = location.get('type', '')
+            location_field = _LOCATION_URL_FIELDS.get(location.get('type'))
 
-            if location_type == 'WEB':
-                web_location = location.get('webLocation', {})
-                web_url = web_location.get('url', '')
-                if web_url and (web_url.startswith('http://') or web_url.startswith('https://')):
+            if location_field:
+                field, url_key = location_field
+                web_url = location.get(field, {}).get(url_key, '')
+                if web_url and web_url.startswith(_HTTP_SCHEMES):
                     metadata = result.get('metadata', {})
-                    result_urls.append((web_url, metadata.get('title', ''), 'webLocation'))
-                    logging.info(f"Result {result_index} - Found URL in webLocation: {web_url}")
+                    result_urls.append(_UrlRecord(web_url, metadata.get('title', ''), field))
+                    logger.info(f"Result {result_index} - Found URL in {field}: {web_url}")
 
             # 2. Second priority: Check document metadata
-            document_metadata = result.get('documentMetadata', {})
-            for key, value in document_metadata.items():
-                if isinstance(value, str) and (value.startswith('http://') or value.startswith('https://')):
-                    # Validate URL format
-                    try:
-                        parsed_url = urlparse(value)
-                        if parsed_url.netloc:  # Ensure it has a domain
-                            result_urls.append((value, document_metadata.get('title', ''), f'documentMetadata[{key}]'))
-                            logging.info(f"Result {result_index} - Found URL in documentMetadata[{key}]: {value}")
-                    except Exception:
-                        logging.warning(f"Result {result_index} - Invalid URL in documentMetadata[{key}]: {value}")
+            self._collect_metadata_urls(result.get('documentMetadata', {}), 'documentMetadata', result_index, result_urls)
 
             # 3. Third priority: Check all metadata fields
-            metadata = result.get('metadata', {})
-            for key, value in metadata.items():
-                if isinstance(value, str) and (value.startswith('http://') or value.startswith('https://')):
-                    # Validate URL format
-                    try:
-                        parsed_url = urlparse(value)
-                        if parsed_url.netloc:  # Ensure it has a domain
-                            result_urls.append((value, metadata.get('title', ''), f'metadata[{key}]'))
-                            logging.info(f"Result {result_index} - Found URL in metadata[{key}]: {value}")
-                    except Exception:
-                        logging.warning(f"Result {result_index} - Invalid URL in metadata[{key}]: {value}")
+            self._collect_metadata_urls(result.get('metadata', {}), 'metadata', result_index, result_urls)
 
             # 4. Last resort: Extract URLs from content using regex
             # Only if we haven't found any URLs from structured fields
             if not result_urls:
                 content = result.get('content', {}).get('text', '')
-                import re
-                url_pattern = r'https?://[\w.-]+(?:\.[\w.-]+)+[\w\-._~:/?#[\]@!$&\'()*+,;=]+'
-                content_urls = re.findall(url_pattern, content)
+                # Most snippets hold no links; a substring scan is far cheaper than the regex
+                content_urls = _URL_RE.finditer(content) if 'http' in content else ()
 
-                # Filter for institution domain URLs only - strict matching
-                for url in content_urls:
+                # Filter for institution domain URLs only - strict matching,
+                # streaming over matches instead of materializing them all first
+                for match in content_urls:
+                    url = match.group()
                     try:
-                        parsed_url = urlparse(url)
-                        domain = parsed_url.netloc.lower()
-
-                        # Remove 'www.' prefix if present
-                        if domain.startswith('www.'):
-                            domain = domain[4:]
-
-                        # Normalize institution domain
-                        norm_institution_domain = institution_domain.lower()
-                        if norm_institution_domain.startswith('www.'):
-                            norm_institution_domain = norm_institution_domain[4:]
-
-                        # Strict domain validation - only exact match or subdomains
-                        if (domain == norm_institution_domain or domain.endswith('.' + norm_institution_domain)) and parsed_url.netloc:
-                            result_urls.append((url, '', 'content'))
-                            logging.info(f"Result {result_index} - Found relevant URL in content: {url}")
+                        netloc = _cached_urlparse(url).netloc
+                        is_valid, domain, norm_institution_domain = _domain_matches(netloc, institution_domain)
+                        if is_valid and netloc:
+                            result_urls.append(_UrlRecord(url, '', 'content'))
+                            logger.info(f"Result {result_index} - Found relevant URL in content: {url}")
                         else:
-                            logging.info(f"Result {result_index} - URL {url} rejected: domain {domain} doesn't match {norm_institution_domain}")
+                            logger.info(f"Result {result_index} - URL {url} rejected: domain {domain} doesn't match {norm_institution_domain}")
                     except Exception as e:
-                        logging.warning(f"Result {result_index} - Error parsing content URL: {str(e)}")
+                        logger.warning(f"Result {result_index} - Error parsing content URL: {str(e)}")
 
             return result_urls
 
         except Exception as e:
-            logging.error(f"Error extracting URLs from result {result_index}: {str(e)}")
+            logger.error(f"Error extracting URLs from result {result_index}: {str(e)}")
             return []
 
     def validate_url_domain(self, url: str, institution_domain: str) -> bool:
         """Validate if a URL belongs to the specified institution domain and is a web link."""
-        import logging
-        from urllib.parse import urlparse
-
         try:
             # If no institution domain is provided, we can't validate
             if not institution_domain:
-                logging.warning(f"No institution domain provided for URL validation: {url}")
+                logger.warning(f"No institution domain provided for URL validation: {url}")
                 return False
 
             # Ensure it's a web URL (http or https)
-            if not (url.startswith('http://') or url.startswith('https://')):
-                logging.info(f"URL {url} rejected: not a web URL")
+            if not url.startswith(_HTTP_SCHEMES):
+                logger.info(f"URL {url} rejected: not a web URL")
                 return False
 
             # Validate URL format
-            parsed_url = urlparse(url)
+            parsed_url = _cached_urlparse(url)
             if not parsed_url.netloc:
-                logging.info(f"URL {url} rejected: invalid URL format")
+                logger.info(f"URL {url} rejected: invalid URL format")
                 return False
 
-            domain = parsed_url.netloc.lower()
-
-            # Remove 'www.' prefix if present for comparison
-            if domain.startswith('www.'):
-                domain = domain[4:]
-
-            # Normalize institution domain for comparison
-            norm_institution_domain = institution_domain.lower()
-            if norm_institution_domain.startswith('www.'):
-                norm_institution_domain = norm_institution_domain[4:]
-
             # Strict domain validation - only accept exact domain match or subdomains
             # This prevents including URLs from unrelated websites
-            is_valid = (
-                domain == norm_institution_domain or  # Exact match
-                domain.endswith('.' + norm_institution_domain)  # Subdomain
-            )
+            is_valid, domain, norm_institution_domain = _domain_matches(parsed_url.netloc, institution_domain)
 
-            logging.info(f"URL validation: domain={domain}, institution_domain={norm_institution_domain}, is_valid={is_valid}")
+            logger.info(f"URL validation: domain={domain}, institution_domain={norm_institution_domain}, is_valid={is_valid}")
             return is_valid
 
         except Exception as e:
-            logging.error(f"Error validating URL {url}: {str(e)}")
+            logger.error(f"Error validating URL {url}: {str(e)}")
             return False
 
     def extract_title_from_url(self, url: str, default_title: str = "") -> str:
         """Extract a meaningful title from a URL path."""
-        import logging
-        from urllib.parse import urlparse
-
-        if not url.startswith(('http://', 'https://')):
+        if not url.startswith(_HTTP_SCHEMES):
             return default_title or "Unknown Reference"
 
         try:
-            parsed_url = urlparse(url)
+            parsed_url = _cached_urlparse(url)
             path = parsed_url.path
 
             if path and path != '/':
                 # Use the last part of the path as title
-                path_parts = path.strip('/').split('/')
-                title = path_parts[-1].replace('-', ' ').replace('_', ' ').title()
+                last_segment = path.strip('/').rpartition('/')[2]
+                title = last_segment.replace('-', ' ').replace('_', ' ').title()
                 return title if title else default_title or "Unknown Reference"
             else:
                 return default_title or parsed_url.netloc
 
         except Exception as e:
-            logging.warning(f"Error extracting title from URL {url}: {str(e)}")
+            logger.warning(f"Error extracting title from URL {url}: {str(e)}")
             return default_title or "Unknown Reference"
 
     def get_specific_source_urls(self, response: Dict, indices: List[int] = None, institution_domain: str = None, institution_website: str = None) -> str:
         """Extract and format source URLs from retrieval results, prioritizing structured metadata."""
-        import logging
-
-        # Setup logging
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
         # Error handling for response
-        if "error" in response:
-            logging.error(f"Error in response: {response.get('error')}")
+        error_msg = response.get("error")
+        if error_msg is not None:
+            logger.error(f"Error in response: {error_msg}")
             return ""
 
         results = response.get("retrievalResults", [])
         if not results:
-            logging.warning("No retrieval results found")
+            logger.warning("No retrieval results found")
             return ""
 
-        logging.info(f"Processing {len(results)} retrieval results for reference links")
-        formatted_urls = []
+        logger.info(f"Processing {len(results)} retrieval results for reference links")
+        formatted_urls = io.StringIO()
+        url_count = 0
         seen_urls = set()
 
         # Default to LPU domain if none provided
         if not institution_domain:
             institution_domain = "lpu.in"
-        logging.info(f"Using institution domain: {institution_domain}")
+        logger.info(f"Using institution domain: {institution_domain}")
 
         # Use the provided institution website or try to construct one
         if institution_website:
-            logging.info(f"Using institution website: {institution_website}")
+            logger.info(f"Using institution website: {institution_website}")
         else:
             # Construct a default website URL if not provided
             institution_website = f"https://www.{institution_domain}"
-            logging.info(f"No institution website provided, using default: {institution_website}")
+            logger.info(f"No institution website provided, using default: {institution_website}")
 
-        # First pass: collect all URLs from all results
-        all_urls = []
+        # Validate and format each URL as it is extracted, in result order
         for i, result in enumerate(results, 1):
             if indices and i not in indices:
                 continue
 
             # Extract URLs from this result using our helper method
-            result_urls = self.extract_urls_from_result(result, i, institution_domain)
-
-            # Add all URLs from this result to the master list
-            all_urls.extend([(url, title, source, i) for url, title, source in result_urls])
+            for url, title, source in self.extract_urls_from_result(result, i, institution_domain):
+                if not url or url in seen_urls:
+                    continue
 
-        # Second pass: filter and format the URLs
-        for url, title, source, result_index in all_urls:
-            if url and url not in seen_urls:
                 # Verify it's from the institution's domain
-                is_valid = self.validate_url_domain(url, institution_domain)
-
-                if is_valid:
-                    seen_urls.add(url)
+                if not self.validate_url_domain(url, institution_domain):
+                    continue
+                seen_urls.add(url)
 
-                    # Get a meaningful title
-                    if not title:
-                        title = self.extract_title_from_url(url, f"Reference {len(formatted_urls) + 1}")
+                # Get a meaningful title
+                if not title:
+                    title = self.extract_title_from_url(url, f"Reference {url_count + 1}")
 
-                    formatted_urls.append(f"- [{title}]({url})")
-                    logging.info(f"Added reference: {title} -> {url} (from {source})")
+                if url_count:
+                    formatted_urls.write("\n")
+                formatted_urls.write(f"- [{title}]({url})")
+                url_count += 1
+                logger.info(f"Added reference: {title} -> {url} (from {source})")
 
-        if not formatted_urls:
-            logging.warning("No valid reference URLs found after filtering")
+        if not url_count:
+            logger.warning("No valid reference URLs found after filtering")
             # Return an empty string instead of a placeholder
             return ""
         else:
-            logging.info(f"Found {len(formatted_urls)} valid reference URLs")
-            return "\n".join(formatted_urls)
+            logger.info(f"Found {url_count} valid reference URLs")
+            return formatted_urls.getvalue()
 
 
     def format_retrieval_results(self, response: Dict) -> (str, str):
         """Format retrieval results into content and reference links."""
-        import logging
-
-        # Setup logging if not already configured
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
         # Error handling for response
-        if "error" in response:
-            error_msg = response.get('error')
-            logging.error(f"Error in format_retrieval_results: {error_msg}")
+        error_msg = response.get("error")
+        if error_msg is not None:
+            logger.error(f"Error in format_retrieval_results: {error_msg}")
             return f"Retrieval Error: {error_msg}", ""
 
         results = response.get("retrievalResults", [])
         if not results:
-            logging.warning("No retrieval results found in format_retrieval_results")
+            logger.warning("No retrieval results found in format_retrieval_results")
             return "No relevant content found in knowledge base.", ""
 
-        logging.info(f"Formatting {len(results)} retrieval results")
-        formatted_content = []
-        reference_links = []
+        logger.info(f"Formatting {len(results)} retrieval results")
+        formatted_content = io.StringIO()
+        reference_links = io.StringIO()
+        content_count = link_count = 0
         seen_sources = set()
 
         try:
-            # First pass: extract content and URLs from the results
-            all_urls = []
+            # Single pass: format each result and its reference links together
             for i, result in enumerate(results, 1):
                 try:
-                    # Extract content and score
-                    content = result.get("content", {}).get("text", "")
                     score = result.get("score", "N/A")
 
                     # Log the structure of the result for debugging
-                    logging.info(f"Result {i} structure: {list(result.keys())}")
+                    logger.info(f"Result {i} structure: {list(result.keys())}")
 
                     # Extract URLs using our helper method
                     # We use an empty domain here since we're not filtering by institution
                     result_urls = self.extract_urls_from_result(result, i, "")
 
-                    # Add all found URLs to the master list
-                    all_urls.extend([(url, title, source, i) for url, title, source in result_urls])
-
                     # Format content
-                    formatted_content.append(f"SOURCE {i} [Score: {score}]")
+                    if content_count:
+                        formatted_content.write("\n")
+                    formatted_content.write(_SOURCE_LINE_FMT % (i, score))
+                    content_count += 1
 
                 except Exception as e:
-                    logging.error(f"Error processing result {i}: {str(e)}")
+                    logger.error(f"Error processing result {i}: {str(e)}")
                     # Continue with next result instead of failing completely
                     continue
 
-            # Second pass: filter and format the URLs
-            for url, title, source, result_index in all_urls:
-                if url and url not in seen_sources:
-                    try:
-                        # Get a meaningful title if not provided
-                        if not title:
-                            title = self.extract_title_from_url(url, f"Reference {len(reference_links) + 1}")
-
-                        reference_links.append(f"- [{title}]({url})")
-                        seen_sources.add(url)
-                        logging.info(f"Added reference link: {title} -> {url} (from {source})")
-                    except Exception as e:
-                        logging.error(f"Error formatting URL {url}: {str(e)}")
-                        # Continue with next URL
-                        continue
+                for url, title, source in result_urls:
+                    if url and url not in seen_sources:
+                        try:
+                            # Get a meaningful title if not provided
+                            if not title:
+                                title = self.extract_title_from_url(url, f"Reference {link_count + 1}")
+
+                            if link_count:
+                                reference_links.write("\n")
+                            reference_links.write(f"- [{title}]({url})")
+                            link_count += 1
+                            seen_sources.add(url)
+                            logger.info(f"Added reference link: {title} -> {url} (from {source})")
+                        except Exception as e:
+                            logger.error(f"Error formatting URL {url}: {str(e)}")
+                            # Continue with next URL
+                            continue
 
-            if not formatted_content:
-                logging.warning("No formatted content generated")
+            if not content_count:
+                logger.warning("No formatted content generated")
                 return "No relevant content with available sources found in knowledge base.", ""
 
-            # Only return reference links if they exist and are not empty
-            final_reference_links = "\n".join(reference_links) if reference_links else ""
-
-            logging.info(f"Returning {len(formatted_content)} formatted content items and {len(reference_links)} reference links")
-            return "\n".join(formatted_content), final_reference_links
+            logger.info(f"Returning {content_count} formatted content items and {link_count} reference links")
+            return formatted_content.getvalue(), reference_links.getvalue()
 
         except Exception as e:
-            logging.error(f"Unexpected error in format_retrieval_results: {str(e)}")
+            logger.error(f"Unexpected error in format_retrieval_results: {str(e)}")
             return "Error formatting retrieval results.", ""
 
 
@@ -577,22 +774,20 @@ class EnhancedBedrockRetriever:
         Returns:
             A tuple of (formatted_content, reference_links)
         """
-        import logging
-
         try:
             # Retrieve content from knowledge base
-            logging.info(f"Retrieving context for query: '{query}'")
+            logger.info(f"Retrieving context for query: '{query}'")
             response = self.retrieve(query, advanced=True)
 
             # Check for errors in the response
-            if "error" in response:
-                error_msg = response.get("error")
-                logging.error(f"Error retrieving context: {error_msg}")
+            error_msg = response.get("error")
+            if error_msg is not None:
+                logger.error(f"Error retrieving context: {error_msg}")
                 return f"Error retrieving information: {error_msg}", ""
 
             # Format the retrieval results
             return self.format_retrieval_results(response)
 
         except Exception as e:
-            logging.error(f"Unexpected error in get_relevant_context: {str(e)}")
+            logger.error(f"Unexpected error in get_relevant_context: {str(e)}")
             return "Error retrieving relevant context.", ""
@@ -1,12 +1,91 @@
+import copy
 import inspect
+import logging
 import re
-from typing import Dict, Any, List, Optional, Tuple, Set, Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, FrozenSet, List, Optional, Tuple, Set, Callable
+
+try:
+    from backend.utils import PUNCT_RE, PUNCT_TABLE
+except ImportError:
+    # Fallback for direct script execution
+    from utils import PUNCT_RE, PUNCT_TABLE
+
+logger = logging.getLogger(__name__)
+
+# JSON Schema type for each supported parameter annotation; anything else is a string
+_TYPE_MAP = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+}
+
+@dataclass(frozen=True, slots=True)
+class RegisteredFunction:
+    """A registered function together with its description and parameter schema."""
+    function: Callable
+    description: str
+    parameters: Dict[str, Any]
+    is_async: bool = False
+
+    def __getitem__(self, key: str) -> Any:
+        # Entries used to be plain dicts; keep info["function"] style access working
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+@lru_cache(maxsize=1024)
+def normalize_query(query: str) -> str:
+    """Normalize query for comparison (cached, since common queries repeat)"""
+    if query.isascii():
+        query = query.translate(PUNCT_TABLE)
+    else:
+        query = PUNCT_RE.sub('', query)
+    return ' '.join(query.lower().split())
+
+def _pattern_flags(pattern: str) -> int:
+    """Case-insensitive matching is only needed for patterns with uppercase characters.
+
+    Queries are lowercased before matching, so an all-lowercase pattern is compiled
+    case-sensitively, which keeps re's literal prefix scan; re.IGNORECASE disables it.
+    Other patterns keep IGNORECASE rather than having their source rewritten, since
+    lowercasing would change escapes (\\S), group syntax ((?P<name>)) and flags.
+    """
+    return re.IGNORECASE if pattern != pattern.lower() else 0
+
+# Numbered backreferences (\1) and group-number conditionals ((?(1)...)) would
+# point at another pattern's groups once patterns share one alternation
+_GROUP_NUMBER_REF_RE = re.compile(r'\\[1-9]|\(\?\(')
+
+def _combine_patterns(patterns: List[str]) -> Optional[re.Pattern]:
+    """Compile patterns into one alternation, or return None when that would change their meaning."""
+    if any(_GROUP_NUMBER_REF_RE.search(pattern) for pattern in patterns):
+        return None
+    try:
+        return re.compile("|".join(
+            f"(?i:{pattern})" if _pattern_flags(pattern) else f"(?:{pattern})" for pattern in patterns
+        ))
+    except re.error:
+        # e.g. global inline flags not at the start, or a group name used twice
+        return None
 
 class FunctionRegistry:
     def __init__(self):
-        self.functions: Dict[str, Dict[str, Any]] = {}
-        self.special_queries: Dict[str, Dict[str, Any]] = {}
+        self.functions: Dict[str, RegisteredFunction] = {}
+        self.special_queries: Dict[str, FrozenSet[str]] = {}
         self.special_patterns: Dict[str, List[re.Pattern]] = {}
+        # Reverse index of special_queries: normalized query -> function name
+        self._query_to_func: Dict[str, str] = {}
+        # One alternation per function so a single search covers all of its patterns;
+        # None when the patterns cannot be combined safely and are searched one by one
+        self._combined_patterns: Dict[str, Optional[re.Pattern]] = {}
+        # Built on first request and kept in step with register()
+        self._schema_cache: Optional[List[Dict[str, Any]]] = None
 
     def register_special_queries(self, function_name: str, queries: List[str]) -> None:
         """Register special queries that should be handled by a specific function"""
@@ -14,11 +93,26 @@ class FunctionRegistry:
             raise ValueError(f"Function {function_name} not registered")
 
         # Normalize the queries
-        normalized_queries = {self._normalize_query(q) for q in queries}
+        normalized_queries = frozenset(self._normalize_query(q) for q in queries)
+
+        # Exact matches resolve to a single function; the earlier registration keeps the query
+        for normalized in normalized_queries:
+            owner = self._query_to_func.get(normalized)
+            if owner is not None and owner != function_name:
+                logger.warning(f"Special query '{normalized}' is already handled by {owner}; ignoring for {function_name}")
 
         # Store the normalized queries
         self.special_queries[function_name] = normalized_queries
-        print(f"Registered {len(normalized_queries)} special queries for function: {function_name}")
+        self._rebuild_query_index()
+        logger.info(f"Registered {len(normalized_queries)} special queries for function: {function_name}")
+
+    def _rebuild_query_index(self) -> None:
+        """Rebuild the reverse index; the earliest registered function wins on duplicates"""
+        index: Dict[str, str] = {}
+        for func_name, queries in self.special_queries.items():
+            for normalized in queries:
+                index.setdefault(normalized, func_name)
+        self._query_to_func = index
 
     def register_special_patterns(self, function_name: str, patterns: List[str]) -> None:
         """Register regex patterns for special queries that should be handled by a specific function"""
@@ -26,45 +120,56 @@ class FunctionRegistry:
             raise ValueError(f"Function {function_name} not registered")
 
         # Compile the patterns
-        compiled_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        compiled_patterns = [re.compile(pattern, _pattern_flags(pattern)) for pattern in patterns]
 
         # Store the compiled patterns
         self.special_patterns[function_name] = compiled_patterns
-        print(f"Registered {len(compiled_patterns)} special patterns for function: {function_name}")
+        self._combined_patterns[function_name] = _combine_patterns(patterns)
+        logger.info(f"Registered {len(compiled_patterns)} special patterns for function: {function_name}")
 
     def _normalize_query(self, query: str) -> str:
         """Normalize query for comparison"""
-        query = re.sub(r'[^\w\s]', '', query)
-        return ' '.join(query.strip().lower().split())
+        return normalize_query(query)
 
     def find_special_query_handler(self, query: str) -> Optional[Tuple[str, Dict[str, Any]]]:
         """Find a function that handles the given special query"""
-        normalized = self._normalize_query(query)
-
         # First try exact matching
-        for func_name, queries in self.special_queries.items():
-            if normalized in queries:
-                return func_name, {"query": query}
+        func_name = self._query_to_func.get(self._normalize_query(query))
+        if func_name is not None:
+            return func_name, {"query": query}
 
         # If no exact match, try pattern matching
+        query_lower = query.lower()
         for func_name, patterns in self.special_patterns.items():
-            for pattern in patterns:
-                if pattern.search(query.lower()):
+            combined = self._combined_patterns.get(func_name)
+            if combined is not None:
+                if combined.search(query_lower):
                     return func_name, {"query": query}
+            elif any(pattern.search(query_lower) for pattern in patterns):
+                return func_name, {"query": query}
 
         return None
 
     def register(self, func: callable) -> callable:
         """Register a function for function calling"""
-        self.functions[func.__name__] = {
-            "function": func,
-            "description": func.__doc__.strip() if func.__doc__ else "",
-            "parameters": self._extract_parameters(func)
-        }
+        replaced = func.__name__ in self.functions
+        info = self.functions[func.__name__] = RegisteredFunction(
+            function=func,
+            description=func.__doc__.strip() if func.__doc__ else "",
+            parameters=self._extract_parameters(func),
+            is_async=inspect.iscoroutinefunction(func)
+        )
+        if self._schema_cache is not None:
+            if replaced:
+                # Re-registering a name replaces its entry; rebuild on next request
+                self._schema_cache = None
+            else:
+                self._schema_cache.append(self._function_schema(func.__name__, info))
         return func
 
-    def _extract_parameters(self, func: callable) -> Dict[str, Any]:
-        """Extract JSON Schema for function parameters"""
+    @staticmethod
+    def _extract_parameters(func: callable) -> Dict[str, Any]:
+        """Extract JSON Schema for function parameters (register() stores it on the entry)"""
         signature = inspect.signature(func)
         properties = {}
         required = []
@@ -73,19 +178,7 @@ class FunctionRegistry:
             if name == 'self':
                 continue
 
-            param_type = "string"  # Default fallback
-            if param.annotation == str:
-                param_type = "string"
-            elif param.annotation == int:
-                param_type = "integer"
-            elif param.annotation == float:
-                param_type = "number"
-            elif param.annotation == bool:
-                param_type = "boolean"
-            elif param.annotation == list:
-                param_type = "array"
-            elif param.annotation == dict:
-                param_type = "object"
+            param_type = _TYPE_MAP.get(param.annotation, "string")
 
             param_schema = {"type": param_type}
             if param.default != inspect.Parameter.empty:
@@ -101,43 +194,42 @@ class FunctionRegistry:
             "required": required
         }
 
+    @staticmethod
+    def _function_schema(name: str, info: RegisteredFunction) -> Dict[str, Any]:
+        """Build the function calling schema entry for one registered function"""
+        return {
+            "type": "function",
+            "function": {
+                "name": name,
+                "description": info.description,
+                "parameters": info.parameters
+            }
+        }
+
     def get_function_call_schema(self) -> List[Dict[str, Any]]:
         """Generate function calling schema for Bedrock-compatible format"""
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": name,
-                    "description": info["description"],
-                    "parameters": info["parameters"]
-                }
-            }
-            for name, info in self.functions.items()
-        ]
+        if self._schema_cache is None:
+            self._schema_cache = [self._function_schema(name, info) for name, info in self.functions.items()]
+        # Callers get their own copy so edits cannot reach the cache or the registered entries
+        return copy.deepcopy(self._schema_cache)
 
     def call_function(self, function_name: str, arguments: Dict[str, Any]) -> Any:
         """Call a registered function with given arguments"""
         if function_name not in self.functions:
             raise ValueError(f"Function {function_name} not registered")
-        func = self.functions[function_name]["function"]
-        return func(**arguments)
+        return self.functions[function_name].function(**arguments)
 
     async def call_function_async(self, function_name: str, arguments: Dict[str, Any]) -> Any:
         """Call a registered function with given arguments asynchronously"""
         if function_name not in self.functions:
             raise ValueError(f"Function {function_name} not registered")
 
-        func = self.functions[function_name]["function"]
-
-        # Check if the function is a coroutine function (async)
-        if inspect.iscoroutinefunction(func):
-            # For async functions
-            result = await func(**arguments)
-            return result
-        else:
-            # For regular functions
-            result = func(**arguments)
-            return result
+        entry = self.functions[function_name]
+
+        # Whether the function is a coroutine function was recorded at registration
+        if entry.is_async:
+            return await entry.function(**arguments)
+        return entry.function(**arguments)
 
 function_registry = FunctionRegistry()
 
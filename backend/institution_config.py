@@ -2,14 +2,15 @@
 Centralized configuration module for institution-specific settings.
 """
 import os
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
 
 # Load institution-specific Knowledge Base IDs
 LPU_KB_ID = os.getenv("LPU_KB_ID")
 AMITY_KB_ID = os.getenv("AMITY_KB_ID")
 
 # Institution configurations
-INSTITUTIONS = {
+_INSTITUTIONS = {
     "lpu": {
         "name": "Lovely Professional University",
         "short_name": "LPU",
@@ -26,8 +27,13 @@ INSTITUTIONS = {
     }
 }
 
+# Read-only views, so lookups can hand out the shared config without defensive copies
+INSTITUTIONS: Mapping[str, Mapping[str, Any]] = MappingProxyType(
+    {institution_id: MappingProxyType(config) for institution_id, config in _INSTITUTIONS.items()}
+)
+
 # Prompt templates
-PROMPT_TEMPLATES = {
+_PROMPT_TEMPLATES = {
     "lpu_template": """
 You are a **Career Counselor** for **Lovely Professional University (LPU)**, guiding students on career opportunities and academic programs.
 
@@ -80,7 +86,9 @@ You are an **Academic Advisor** for **Amity University**, helping students with
 """
 }
 
-def get_institution_config(institution_id: str) -> Optional[Dict[str, Any]]:
+PROMPT_TEMPLATES: Mapping[str, str] = MappingProxyType(_PROMPT_TEMPLATES)
+
+def get_institution_config(institution_id: str) -> Optional[Mapping[str, Any]]:
     """Get configuration for a specific institution."""
     return INSTITUTIONS.get(institution_id)
 
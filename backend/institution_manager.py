@@ -1,10 +1,33 @@
 from typing import Dict, Optional, Any
 import os
+import re
 import logging
-from institution_settings import institution_settings
+from urllib.parse import urlparse
+# Use absolute import to avoid module structure issues
+try:
+    from backend.institution_settings import institution_settings
+except ImportError:
+    # Fallback for direct script execution
+    from institution_settings import institution_settings
 
 logger = logging.getLogger(__name__)
 
+# All institution placeholders, substituted in a single pass over the template
+_PLACEHOLDER_RE = re.compile(
+    r"\{\{(INSTITUTION_NAME|INSTITUTION_SHORT_NAME|ROLE|WEBSITE|ADMISSIONS_URL|PROGRAMS_URL)\}\}"
+)
+
+# Domain used to filter references when an institution has no usable website
+DEFAULT_INSTITUTION_DOMAIN = "lpu.in"
+
+def _website_domain(website: str) -> str:
+    """Extract the bare domain from a website URL (e.g., "https://www.lpu.in" -> "lpu.in")."""
+    domain = urlparse(website).netloc
+    # Remove www. prefix if present
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain or DEFAULT_INSTITUTION_DOMAIN
+
 class InstitutionManager:
     def __init__(self):
         """Initialize the institution manager using Pydantic settings."""
@@ -15,6 +38,15 @@ class InstitutionManager:
         logger.info(f"Initialized InstitutionManager with default institution: {self.default_institution_id}")
         logger.info(f"Available institutions: {list(self.institutions.keys())}")
 
+        # Institution values are fixed once loaded, so domains and prompts are derived up front
+        self._domains: Dict[str, str] = {
+            institution_id: _website_domain(institution.website)
+            for institution_id, institution in self.institutions.items()
+        }
+        self._processed_prompts: Dict[str, str] = {
+            institution_id: self._render_prompt(institution_id) for institution_id in self.institutions
+        }
+
     def get_institution_config(self, institution_id: Optional[str] = None) -> Dict:
         """Get institution configuration, falling back to default if not specified."""
         if not institution_id:
@@ -25,6 +57,10 @@ class InstitutionManager:
             raise ValueError(f"Institution {institution_id} not found")
         return institution
 
+    def get_institution_domain(self, institution_id: Optional[str] = None) -> str:
+        """Get the domain of an institution's website, falling back to the default domain."""
+        return self._domains.get(institution_id or self.default_institution_id, DEFAULT_INSTITUTION_DOMAIN)
+
     def get_prompt_template(self, institution_id: Optional[str] = None) -> str:
         """Get the raw prompt template for an institution."""
         institution = self.get_institution_config(institution_id)
@@ -33,20 +69,24 @@ class InstitutionManager:
 
     def get_processed_prompt(self, institution_id: Optional[str] = None) -> str:
         """Get a prompt with all placeholders replaced with institution values."""
+        processed_template = self._processed_prompts.get(institution_id or self.default_institution_id)
+        if processed_template is None:
+            # Unknown institutions raise from get_institution_config as before
+            processed_template = self._render_prompt(institution_id)
+        return processed_template
+
+    def _render_prompt(self, institution_id: Optional[str] = None) -> str:
+        """Replace all placeholders in an institution's prompt template."""
         institution = self.get_institution_config(institution_id)
         template = self.get_prompt_template(institution_id)
 
-        placeholders = {
-            "{{INSTITUTION_NAME}}": institution.name,
-            "{{INSTITUTION_SHORT_NAME}}": institution.short_name,
-            "{{ROLE}}": institution.role,
-            "{{WEBSITE}}": institution.website,
-            "{{ADMISSIONS_URL}}": institution.admissions_url,
-            "{{PROGRAMS_URL}}": institution.programs_url
+        values = {
+            "INSTITUTION_NAME": institution.name,
+            "INSTITUTION_SHORT_NAME": institution.short_name,
+            "ROLE": institution.role,
+            "WEBSITE": institution.website,
+            "ADMISSIONS_URL": institution.admissions_url,
+            "PROGRAMS_URL": institution.programs_url
         }
 
-        processed_template = template
-        for placeholder, value in placeholders.items():
-            processed_template = processed_template.replace(placeholder, value)
-
-        return processed_template
\ No newline at end of file
+        return _PLACEHOLDER_RE.sub(lambda match: values[match.group(1)], template)
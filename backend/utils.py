@@ -10,6 +10,14 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from config import get_full_config, set_aws_credentials
 
+# Punctuation stripped from queries. PUNCT_TABLE deletes the same characters for
+# ASCII input in a single str.translate pass; other input goes through PUNCT_RE.
+PUNCT_RE = re.compile(r'[^\w\s]')
+PUNCT_TABLE = {
+    c: None for c in range(128)
+    if not (chr(c).isalnum() or chr(c) == '_' or chr(c).isspace())
+}
+
 def load_config():
     """
     Load configuration from the centralized Pydantic settings.
@@ -90,8 +98,9 @@ def get_cached_answer(question: str, cache: Dict, config: Dict) -> Optional[str]
     if not config["cache"]["enabled"]:
         return None
     normalized_q = preprocess_query(question)
-    if normalized_q in cache:
-        entry = cache[normalized_q]
+    # Single lookup, so an entry expiring between a membership test and a read cannot raise
+    entry = cache.get(normalized_q)
+    if entry is not None:
         expiry_seconds = config["cache"]["expiry_seconds"]
         if datetime.now() - entry["timestamp"] < timedelta(seconds=expiry_seconds):
             return entry["answer"]
@@ -0,0 +1,497 @@
+"""
+Unit tests for the Bedrock retriever query helpers.
+"""
+import json
+import pytest
+from unittest.mock import MagicMock
+
+from backend import bedrock_retriever
+from backend.bedrock_retriever import EnhancedBedrockRetriever
+
+TEST_CONFIG = {
+    "aws": {
+        "s3_kb_id": "test-kb",
+        "region": "us-east-1",
+        "auth_method": "credentials",
+        "access_key": "test-access-key",
+        "secret_key": "test-secret-key"
+    },
+    "retrieval": {
+        "num_results": 5,
+        "min_score": 0.5
+    }
+}
+
+@pytest.fixture(autouse=True)
+def clear_shared_caches():
+    """Start every test with empty shared retrieval and presigned URL caches."""
+    bedrock_retriever._RETRIEVAL_CACHE.clear()
+    bedrock_retriever._PRESIGNED_URL_CACHE.clear()
+    yield
+    bedrock_retriever._RETRIEVAL_CACHE.clear()
+    bedrock_retriever._PRESIGNED_URL_CACHE.clear()
+
+@pytest.fixture
+def retriever():
+    """Retriever built from a static test configuration."""
+    return EnhancedBedrockRetriever(TEST_CONFIG)
+
+@pytest.mark.unit
+class TestPreprocessQuery:
+    """Test query preprocessing."""
+
+    def test_expands_acronyms(self, retriever):
+        """Test that known acronyms are expanded."""
+        assert retriever.preprocess_query("CSE at LPU") == "computer science engineering at LPU"
+        assert retriever.preprocess_query("ai and ml") == "artificial intelligence and machine learning"
+
+    def test_ignores_acronyms_inside_words(self, retriever):
+        """Test that acronyms are only expanded on word boundaries."""
+        assert retriever.preprocess_query("email rail") == "email rail"
+
+    def test_strips_punctuation_and_whitespace(self, retriever):
+        """Test that punctuation is removed and whitespace collapsed."""
+        assert retriever.preprocess_query("  What   are the fees?  ") == "what are the fees"
+
+    def test_strips_non_ascii_punctuation(self, retriever):
+        """Test that punctuation outside ASCII is removed as well."""
+        assert retriever.preprocess_query("what’s the fee… for b_tech?") == "whats the fee for b_tech"
+
+@pytest.mark.unit
+class TestClientReuse:
+    """Test that AWS clients are shared between retriever instances."""
+
+    def test_clients_shared_across_instances(self):
+        """Test that retrievers with the same config reuse the same clients."""
+        first = EnhancedBedrockRetriever(TEST_CONFIG)
+        second = EnhancedBedrockRetriever(TEST_CONFIG)
+        assert first.bedrock_client is second.bedrock_client
+        assert first.s3_client is second.s3_client
+
+@pytest.mark.unit
+class TestCachedRetrieve:
+    """Test caching of Bedrock retrieval responses."""
+
+    def test_cache_shared_across_instances(self):
+        """Test that a response cached by one retriever is reused by another."""
+        first = EnhancedBedrockRetriever(TEST_CONFIG)
+        first.bedrock_client = MagicMock()
+        first.bedrock_client.retrieve.return_value = {"retrievalResults": []}
+        second = EnhancedBedrockRetriever(TEST_CONFIG)
+        second.bedrock_client = MagicMock()
+
+        first.cached_retrieve("lpu fees")
+        second.cached_retrieve("LPU  fees")
+
+        first.bedrock_client.retrieve.assert_called_once_with(
+            knowledgeBaseId="test-kb",
+            retrievalQuery={"text": "lpu fees"},
+            retrievalConfiguration={"vectorSearchConfiguration": {"numberOfResults": 5}}
+        )
+        second.bedrock_client.retrieve.assert_not_called()
+
+    def test_cache_disabled_in_config(self):
+        """Test that every call reaches Bedrock when caching is disabled."""
+        retriever = EnhancedBedrockRetriever({**TEST_CONFIG, "cache": {"enabled": False, "expiry_seconds": 3600}})
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.return_value = {"retrievalResults": []}
+
+        retriever.cached_retrieve("lpu fees")
+        retriever.cached_retrieve("lpu fees")
+
+        assert retriever.bedrock_client.retrieve.call_count == 2
+
+    def test_response_metadata_is_dropped(self, retriever):
+        """Test that only the retrieval results are kept from the Bedrock response."""
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.return_value = {
+            "retrievalResults": [{"content": {"text": "fees"}}],
+            "ResponseMetadata": {"HTTPStatusCode": 200, "HTTPHeaders": {}}
+        }
+
+        assert retriever.cached_retrieve("lpu fees") == {"retrievalResults": [{"content": {"text": "fees"}}]}
+
+    def test_errors_are_not_cached(self, retriever):
+        """Test that failed lookups are retried on the next call."""
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.side_effect = [RuntimeError("boom"), {"retrievalResults": []}]
+
+        assert "error" in retriever.cached_retrieve("lpu fees")
+        assert retriever.cached_retrieve("lpu fees") == {"retrievalResults": []}
+
+    def test_callers_cannot_alter_cached_response(self, retriever):
+        """Test that changing a returned response leaves the cached entry intact."""
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.return_value = {"retrievalResults": [{"content": {"text": "fees"}}]}
+
+        first = retriever.cached_retrieve("lpu fees")
+        first["retrievalResults"].clear()
+        first["error"] = "edited"
+        second = retriever.cached_retrieve("lpu fees")
+        second["retrievalResults"].append({"content": {"text": "extra"}})
+
+        assert retriever.cached_retrieve("lpu fees") == {"retrievalResults": [{"content": {"text": "fees"}}]}
+        retriever.bedrock_client.retrieve.assert_called_once()
+
+@pytest.mark.unit
+@pytest.mark.redis
+class TestRedisRetrievalCache:
+    """Test the Redis second-level retrieval cache."""
+
+    def test_redis_hit_skips_bedrock(self, mock_redis_client):
+        """Test that a response found in Redis is returned without calling Bedrock."""
+        mock_redis_client.get.return_value = json.dumps({"retrievalResults": [{"content": {"text": "cached"}}]})
+        retriever = EnhancedBedrockRetriever(TEST_CONFIG, redis_client=mock_redis_client)
+        retriever.bedrock_client = MagicMock()
+
+        response = retriever.cached_retrieve("lpu fees")
+
+        assert response == {"retrievalResults": [{"content": {"text": "cached"}}]}
+        retriever.bedrock_client.retrieve.assert_not_called()
+
+    def test_bedrock_response_written_to_redis(self, mock_redis_client):
+        """Test that a fresh Bedrock response is stored in Redis with a TTL."""
+        retriever = EnhancedBedrockRetriever(TEST_CONFIG, redis_client=mock_redis_client)
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.return_value = {
+            "retrievalResults": [{"content": {"text": "fresh"}}],
+            "ResponseMetadata": {"HTTPStatusCode": 200}
+        }
+
+        retriever.cached_retrieve("lpu fees")
+
+        key, ttl, payload = mock_redis_client.setex.call_args[0]
+        assert key.startswith("retrieval:")
+        assert ttl == 900
+        assert json.loads(payload) == {"retrievalResults": [{"content": {"text": "fresh"}}]}
+
+    def test_redis_errors_fall_back_to_bedrock(self, mock_redis_client):
+        """Test that Redis failures do not break retrieval."""
+        mock_redis_client.get.side_effect = Exception("Redis down")
+        mock_redis_client.setex.side_effect = Exception("Redis down")
+        retriever = EnhancedBedrockRetriever(TEST_CONFIG, redis_client=mock_redis_client)
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.return_value = {"retrievalResults": []}
+
+        assert retriever.cached_retrieve("lpu fees") == {"retrievalResults": []}
+
+@pytest.mark.unit
+class TestRetrieve:
+    """Test advanced retrieval across query variations."""
+
+    def test_merges_variations_in_order_without_duplicates(self, retriever):
+        """Test that results from all variations are merged in order and deduplicated."""
+        responses = {
+            "fee": [{"content": {"text": "shared"}}, {"content": {"text": "fee only"}}],
+            "fees": [{"content": {"text": "shared"}}, {"content": {"text": "fees only"}}],
+            "tuition": [{"content": {"text": "tuition only"}}],
+        }
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.side_effect = lambda **kwargs: {
+            "retrievalResults": responses[kwargs["retrievalQuery"]["text"]]
+        }
+
+        result = retriever.retrieve("fee", debug=False)
+
+        texts = [r["content"]["text"] for r in result["retrievalResults"]]
+        assert texts == ["shared", "fee only", "fees only", "tuition only"]
+
+    def test_stops_merging_at_num_results(self):
+        """Test that no more than num_results unique results are returned."""
+        retriever = EnhancedBedrockRetriever({**TEST_CONFIG, "retrieval": {"num_results": 2, "min_score": 0.5}})
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.side_effect = lambda **kwargs: {
+            "retrievalResults": [
+                {"content": {"text": f"{kwargs['retrievalQuery']['text']} {n}"}} for n in range(3)
+            ]
+        }
+
+        result = retriever.retrieve("fee", debug=False)
+
+        texts = [r["content"]["text"] for r in result["retrievalResults"]]
+        assert texts == ["fee 0", "fee 1"]
+
+    def test_query_without_synonyms_is_retrieved_once(self, retriever):
+        """Test that a query with no synonym terms issues a single lookup."""
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.return_value = {"retrievalResults": [{"content": {"text": "hostel"}}]}
+
+        result = retriever.retrieve("hostel rules", debug=False)
+
+        assert result == {"retrievalResults": [{"content": {"text": "hostel"}}]}
+        retriever.bedrock_client.retrieve.assert_called_once()
+
+    def test_all_variations_failing_returns_error(self, retriever):
+        """Test that an error is returned when every variation fails."""
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.side_effect = RuntimeError("boom")
+
+        result = retriever.retrieve("fee", debug=False)
+
+        assert result["error"] == "All retrieval attempts failed"
+        assert result["retrievalResults"] == []
+
+    def test_debug_structure_logged_only_at_debug_level(self, retriever, caplog):
+        """Test that response structure is logged only when debug logging is enabled."""
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.return_value = {"retrievalResults": [{"content": {"text": "hostel"}}]}
+
+        caplog.set_level("INFO", logger=bedrock_retriever.logger.name)
+        retriever.retrieve("hostel rules", debug=True)
+        assert "First result keys" not in caplog.text
+
+        caplog.set_level("DEBUG", logger=bedrock_retriever.logger.name)
+        retriever._merged_cache.clear()
+        retriever.retrieve("hostel rules", debug=True)
+        assert "First result keys: ['content']" in caplog.text
+
+    def test_repeated_query_served_from_merged_cache(self, retriever):
+        """Test that a repeated query skips expansion and the variation lookups."""
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.return_value = {"retrievalResults": [{"content": {"text": "fee"}}]}
+        first = retriever.retrieve("fee")
+        retriever.expand_query = MagicMock()
+
+        assert retriever.retrieve("fee") == first
+        retriever.expand_query.assert_not_called()
+
+    def test_callers_cannot_alter_merged_cache(self, retriever):
+        """Test that changing a returned merged response leaves the cached entry intact."""
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.return_value = {"retrievalResults": [{"content": {"text": "fee"}}]}
+
+        retriever.retrieve("fee")["retrievalResults"].clear()
+        retriever.retrieve("fee")["retrievalResults"].append({"content": {"text": "extra"}})
+
+        assert retriever.retrieve("fee") == {"retrievalResults": [{"content": {"text": "fee"}}]}
+
+    def test_partial_failures_not_cached(self, retriever):
+        """Test that merged results are not cached when a variation failed."""
+        def bedrock_retrieve(**kwargs):
+            if kwargs["retrievalQuery"]["text"] != "fee":
+                raise RuntimeError("boom")
+            return {"retrievalResults": [{"content": {"text": "fee"}}]}
+
+        retriever.bedrock_client = MagicMock()
+        retriever.bedrock_client.retrieve.side_effect = bedrock_retrieve
+        retriever.retrieve("fee")
+
+        assert retriever._merged_cache.get("fee") is None
+
+@pytest.mark.unit
+class TestExpandQuery:
+    """Test synonym-based query expansion."""
+
+    def test_no_synonyms_returns_query(self, retriever):
+        """Test that a query without synonym terms is returned unchanged."""
+        assert retriever.expand_query("hostel rules") == ["hostel rules"]
+
+    def test_substitutes_synonyms_in_place(self, retriever):
+        """Test that synonyms replace the matching term at its position."""
+        assert retriever.expand_query("what is the fee for btech") == [
+            "what is the fee for btech",
+            "what is the fees for btech",
+            "what is the tuition for btech",
+        ]
+
+    def test_limits_number_of_variations(self, retriever):
+        """Test that expansion stops at the requested number of variations."""
+        assert len(retriever.expand_query("fee admission course")) == 3
+        assert retriever.expand_query("fee", max_variations=2) == ["fee", "fees"]
+
+    def test_matches_multi_word_synonym_keys(self, retriever):
+        """Test that multi-word synonym keys take precedence over their parts."""
+        retriever.synonyms = {"fee": ["fees"], "hostel fee": ["accommodation charges"]}
+        assert retriever.expand_query("lpu hostel fee") == [
+            "lpu hostel fee",
+            "lpu accommodation charges",
+        ]
+
+    def test_synonym_table_changes_are_matched(self, retriever):
+        """Test that replacing or extending the synonym table takes effect without recompiling by hand."""
+        retriever.synonyms = {"hostel": ["dorm"]}
+        assert retriever.expand_query("hostel fee") == ["hostel fee", "dorm fee"]
+
+        retriever.synonyms["mess"] = ["canteen"]
+        assert retriever.expand_query("mess timings") == ["mess timings", "canteen timings"]
+
+        retriever.synonyms = {}
+        assert retriever.expand_query("hostel fee") == ["hostel fee"]
+
+    def test_synonym_tables_not_shared_between_instances(self, retriever):
+        """Test that changing one retriever's synonyms leaves other retrievers untouched."""
+        other = EnhancedBedrockRetriever(TEST_CONFIG)
+        retriever.synonyms["fee"].insert(0, "charges")
+
+        assert retriever.expand_query("fee") == ["fee", "charges", "fees"]
+        assert other.expand_query("fee") == ["fee", "fees", "tuition"]
+
+@pytest.mark.unit
+class TestPresignedUrl:
+    """Test presigned URL generation for S3 URIs."""
+
+    def test_parses_bucket_and_key(self, retriever):
+        """Test that the bucket and full key are passed to the signer."""
+        retriever.s3_client = MagicMock()
+        retriever.s3_client.generate_presigned_url.return_value = "https://signed"
+
+        assert retriever.get_presigned_url("s3://bucket/docs/a?b.pdf") == "https://signed"
+        retriever.s3_client.generate_presigned_url.assert_called_once_with(
+            'get_object',
+            Params={'Bucket': 'bucket', 'Key': 'docs/a?b.pdf'},
+            ExpiresIn=3600
+        )
+
+    def test_reuses_signed_url(self, retriever):
+        """Test that the same URI is only signed once."""
+        retriever.s3_client = MagicMock()
+        retriever.s3_client.generate_presigned_url.return_value = "https://signed"
+
+        retriever.get_presigned_url("s3://bucket/doc.pdf")
+        retriever.get_presigned_url("s3://bucket/doc.pdf")
+        EnhancedBedrockRetriever(TEST_CONFIG).get_presigned_url("s3://bucket/doc.pdf")
+
+        retriever.s3_client.generate_presigned_url.assert_called_once()
+
+    def test_invalid_uri_returned_unchanged(self, retriever):
+        """Test that malformed and non-S3 URIs are returned as-is."""
+        assert retriever.get_presigned_url("s3://bucket") == "s3://bucket"
+        assert retriever.get_presigned_url("https://www.lpu.in") == "https://www.lpu.in"
+
+@pytest.mark.unit
+class TestFormatRetrievalResults:
+    """Test formatting of retrieval results into content and reference links."""
+
+    def test_formats_sources_and_dedupes_links(self, retriever):
+        """Test that each result is listed and repeated URLs are linked once."""
+        response = {
+            "retrievalResults": [
+                {
+                    "content": {"text": "Admissions"},
+                    "score": 0.9,
+                    "location": {"type": "WEB", "webLocation": {"url": "https://www.lpu.in/admission/"}},
+                    "metadata": {"title": "Admissions"}
+                },
+                {
+                    "content": {"text": "More admissions"},
+                    "score": 0.8,
+                    "location": {"type": "WEB", "webLocation": {"url": "https://www.lpu.in/admission/"}}
+                },
+                {
+                    "content": {"text": "Hostels"},
+                    "score": 0.7,
+                    "location": {"type": "WEB", "webLocation": {"url": "https://www.lpu.in/hostel-facilities"}}
+                },
+            ]
+        }
+
+        content, links = retriever.format_retrieval_results(response)
+
+        assert content == "SOURCE 1 [Score: 0.9]\nSOURCE 2 [Score: 0.8]\nSOURCE 3 [Score: 0.7]"
+        assert links == (
+            "- [Admissions](https://www.lpu.in/admission/)\n"
+            "- [Hostel Facilities](https://www.lpu.in/hostel-facilities)"
+        )
+
+    def test_error_response(self, retriever):
+        """Test that retrieval errors are surfaced in the content."""
+        content, links = retriever.format_retrieval_results({"error": "boom", "retrievalResults": []})
+        assert content == "Retrieval Error: boom"
+        assert links == ""
+
+@pytest.mark.unit
+class TestGetSpecificSourceUrls:
+    """Test institution-filtered reference links."""
+
+    def test_keeps_only_institution_urls(self, retriever):
+        """Test that only URLs on the institution domain are returned."""
+        response = {
+            "retrievalResults": [
+                {
+                    "content": {"text": "See https://www.lpu.in/placements and https://example.com/x"},
+                    "location": {"type": "S3"}
+                },
+                {
+                    "content": {"text": "Scholarships"},
+                    "location": {"type": "WEB", "webLocation": {"url": "https://www.lpu.in/scholarship"}},
+                    "metadata": {"title": "Scholarships"}
+                },
+                {
+                    "content": {"text": "Other"},
+                    "location": {"type": "WEB", "webLocation": {"url": "https://example.com/other"}}
+                },
+            ]
+        }
+
+        links = retriever.get_specific_source_urls(response, institution_domain="lpu.in")
+
+        assert links == (
+            "- [Placements](https://www.lpu.in/placements)\n"
+            "- [Scholarships](https://www.lpu.in/scholarship)"
+        )
+
+    def test_no_valid_urls_returns_empty_string(self, retriever):
+        """Test that an empty string is returned when nothing matches."""
+        response = {"retrievalResults": [{"content": {"text": "No links here"}}]}
+        assert retriever.get_specific_source_urls(response, institution_domain="lpu.in") == ""
+
+@pytest.mark.unit
+class TestExtractUrlsFromResult:
+    """Test URL extraction from a single retrieval result."""
+
+    def test_collects_metadata_urls_under_any_key(self, retriever):
+        """Test that web URLs are found under arbitrary metadata keys."""
+        result = {
+            "documentMetadata": {"title": "Fees", "page": "https://www.lpu.in/fees", "size": 12},
+            "metadata": {"title": "Hostel", "x-amz-source": "https://www.lpu.in/hostel", "uri": "s3://bucket/key"},
+        }
+
+        urls = retriever.extract_urls_from_result(result, 1, "lpu.in")
+
+        assert urls == [
+            ("https://www.lpu.in/fees", "Fees", "documentMetadata[page]"),
+            ("https://www.lpu.in/hostel", "Hostel", "metadata[x-amz-source]"),
+        ]
+
+@pytest.mark.unit
+class TestValidateUrlDomain:
+    """Test institution domain validation of reference URLs."""
+
+    def test_accepts_domain_and_subdomains(self, retriever):
+        """Test that the institution domain and its subdomains are accepted."""
+        assert retriever.validate_url_domain("https://lpu.in/fees", "WWW.LPU.IN")
+        assert retriever.validate_url_domain("https://admissions.lpu.in/apply", "lpu.in")
+
+    def test_rejects_lookalike_domains(self, retriever):
+        """Test that domains merely containing the institution domain are rejected."""
+        assert not retriever.validate_url_domain("https://lpu.in.example.com/", "lpu.in")
+        assert not retriever.validate_url_domain("https://notlpu.in/", "lpu.in")
+
+@pytest.mark.unit
+class TestExtractTitleFromUrl:
+    """Test deriving reference titles from URLs."""
+
+    def test_uses_last_path_segment(self, retriever):
+        """Test that the last path segment becomes a title-cased title."""
+        assert retriever.extract_title_from_url("https://www.lpu.in/admission/fee_structure-2024/?x=1") == "Fee Structure 2024"
+
+    def test_falls_back_to_default_or_domain(self, retriever):
+        """Test the fallbacks for URLs without a path."""
+        assert retriever.extract_title_from_url("https://www.lpu.in/") == "www.lpu.in"
+        assert retriever.extract_title_from_url("https://www.lpu.in", "Reference 1") == "Reference 1"
+        assert retriever.extract_title_from_url("s3://bucket/key") == "Unknown Reference"
+
+@pytest.mark.unit
+class TestContentFingerprint:
+    """Test the content fingerprint used for deduplication."""
+
+    def test_fingerprint_is_stable(self):
+        """Test that the fingerprint does not depend on the process hash seed."""
+        assert bedrock_retriever._content_fingerprint("LPU admissions").hex() == "492b835fafb10aad7df157be2d765f71"
+        assert bedrock_retriever._content_fingerprint("a") != bedrock_retriever._content_fingerprint("b")
+
+    def test_fingerprint_ignores_whitespace_differences(self):
+        """Test that snippets differing only in whitespace share a fingerprint."""
+        fingerprint = bedrock_retriever._content_fingerprint
+        assert fingerprint("LPU  admissions\n") == fingerprint("LPU admissions")
+        assert fingerprint("LPU admissions open") != fingerprint("LPU admissions")
@@ -11,7 +11,8 @@ from backend.config import (
     RedisSettings,
     MemorySettings,
     get_aws_config,
-    get_full_config
+    get_full_config,
+    set_aws_credentials
 )
 
 @pytest.mark.unit
@@ -108,3 +109,48 @@ class TestConfig:
         )
         assert memory_settings.max_history == 10
         assert memory_settings.session_ttl == 3600
+
+    @patch.dict(os.environ, {"PORT": "9000", "HOST": "0.0.0.0"})
+    def test_redis_ignores_unprefixed_env(self):
+        """Test that generic PORT/HOST variables do not leak into Redis settings."""
+        redis_settings = RedisSettings()
+        assert redis_settings.host == "localhost"
+        assert redis_settings.port == 6379
+
+    @patch.dict(os.environ, {"AWS_REGION": "eu-west-1", "AWS_AUTH_METHOD": "iam_role"})
+    def test_aws_settings_from_env(self):
+        """Test that AWS settings are read from environment variables at instantiation."""
+        aws_settings = AWSSettings()
+        assert aws_settings.region == "eu-west-1"
+        assert aws_settings.use_iam_role is True
+
+    def test_config_getters_return_independent_copies(self):
+        """Test that modifying a returned config does not affect later calls."""
+        config = get_full_config()
+        config["aws"]["region"] = "modified"
+        config["cache"].clear()
+
+        assert get_aws_config()["region"] == settings.aws.region
+        assert get_full_config()["cache"]["expiry_seconds"] == settings.cache.expiry_seconds
+
+    def test_legacy_constants_resolve_from_settings(self):
+        """Test that backward-compatible module constants mirror the settings instance."""
+        import backend.config as config_module
+        from backend.config import PORT, LPU_KB_ID
+
+        assert PORT == settings.server.port
+        assert LPU_KB_ID == (settings.knowledge_base.lpu_kb_id or settings.knowledge_base.kb_id)
+        assert config_module.WEBSOCKET_URL == settings.websocket.url
+        with pytest.raises(AttributeError):
+            config_module.NOT_A_SETTING
+
+    @patch.dict(os.environ, {"AWS_REGION_NAME": "", "AWS_ACCESS_KEY_ID": "existing-key"})
+    def test_set_aws_credentials_fills_only_missing_vars(self):
+        """Test that set_aws_credentials fills unset variables and keeps existing ones."""
+        with patch.object(settings.aws, "auth_method", "credentials"), \
+             patch.object(settings.aws, "access_key_id", "settings-key"), \
+             patch.object(settings.aws, "region_name", "ap-south-1"):
+            set_aws_credentials()
+
+        assert os.environ["AWS_REGION_NAME"] == "ap-south-1"
+        assert os.environ["AWS_ACCESS_KEY_ID"] == "existing-key"
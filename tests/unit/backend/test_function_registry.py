@@ -0,0 +1,240 @@
+"""
+Unit tests for the function registry.
+"""
+import re
+import pytest
+
+from backend.function_registry import FunctionRegistry, normalize_query
+
+def lookup_course(name: str, year: int, fees: float = 0.0, hostel: bool = False, tags: list = None, extra=None) -> str:
+    """Look up a course."""
+    return name
+
+@pytest.mark.unit
+class TestExtractParameters:
+    """Test JSON Schema extraction from function signatures."""
+
+    def test_maps_annotations_to_schema_types(self):
+        """Test that annotations map to JSON Schema types and defaults are kept."""
+        registry = FunctionRegistry()
+        registry.register(lookup_course)
+
+        parameters = registry.functions["lookup_course"].parameters
+
+        assert parameters["properties"] == {
+            "name": {"type": "string"},
+            "year": {"type": "integer"},
+            "fees": {"type": "number", "default": 0.0},
+            "hostel": {"type": "boolean", "default": False},
+            "tags": {"type": "array", "default": None},
+            "extra": {"type": "string", "default": None},
+        }
+        assert parameters["required"] == ["name", "year"]
+
+    def test_schema_not_shared_between_registries(self):
+        """Test that editing one registry's parameter schema leaves other registries unchanged."""
+        first = FunctionRegistry()
+        second = FunctionRegistry()
+        first.register(lookup_course)
+        second.register(lookup_course)
+
+        first.functions["lookup_course"].parameters["required"].append("fees")
+
+        assert second.functions["lookup_course"].parameters["required"] == ["name", "year"]
+
+def check_status(application_id: str) -> str:
+    """Check an application's status."""
+    return application_id
+
+@pytest.mark.unit
+class TestFunctionCallSchema:
+    """Test the function calling schema."""
+
+    def test_schema_reused_and_extended_on_register(self):
+        """Test that the schema is built once and kept current as functions are registered."""
+        registry = FunctionRegistry()
+        registry.register(lookup_course)
+        assert len(registry.get_function_call_schema()) == 1
+
+        registry.register(check_status)
+
+        names = [entry["function"]["name"] for entry in registry.get_function_call_schema()]
+        assert names == ["lookup_course", "check_status"]
+        assert registry.get_function_call_schema()[1] == {
+            "type": "function",
+            "function": {
+                "name": "check_status",
+                "description": "Check an application's status.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {"application_id": {"type": "string"}},
+                    "required": ["application_id"]
+                }
+            }
+        }
+
+    def test_returned_schema_is_a_copy(self):
+        """Test that editing a returned schema does not change later results or registered entries."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+
+        schema = registry.get_function_call_schema()
+        schema[0]["function"]["parameters"]["required"].clear()
+        schema.append({"type": "function"})
+
+        assert len(registry.get_function_call_schema()) == 1
+        assert registry.get_function_call_schema()[0]["function"]["parameters"]["required"] == ["application_id"]
+        assert registry.functions["check_status"].parameters["required"] == ["application_id"]
+
+    def test_reregistering_replaces_entry(self):
+        """Test that registering a name again replaces its schema entry."""
+        registry = FunctionRegistry()
+        registry.register(lookup_course)
+        registry.get_function_call_schema()
+
+        registry.register(lookup_course)
+
+        assert len(registry.get_function_call_schema()) == 1
+
+    def test_entries_support_mapping_access(self):
+        """Test that registered entries still support dict-style field access."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        entry = registry.functions["check_status"]
+
+        assert entry["function"] is entry.function is check_status
+        assert entry["description"] == "Check an application's status."
+        with pytest.raises(KeyError):
+            entry["missing"]
+
+async def fetch_status(application_id: str) -> str:
+    """Fetch an application's status."""
+    return application_id
+
+@pytest.mark.unit
+class TestCallFunctionAsync:
+    """Test async function dispatch."""
+
+    @pytest.mark.asyncio
+    async def test_dispatches_sync_and_async_functions(self):
+        """Test that coroutine functions are awaited and plain functions are called directly."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        registry.register(fetch_status)
+
+        assert registry.functions["fetch_status"].is_async is True
+        assert registry.functions["check_status"].is_async is False
+        assert await registry.call_function_async("fetch_status", {"application_id": "A1"}) == "A1"
+        assert await registry.call_function_async("check_status", {"application_id": "A2"}) == "A2"
+
+@pytest.mark.unit
+class TestSpecialQueries:
+    """Test special query lookup."""
+
+    def test_exact_match_uses_normalized_query(self):
+        """Test that exact special queries match regardless of case and punctuation."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        registry.register_special_queries("check_status", ["Where is my application?"])
+
+        assert registry.find_special_query_handler("WHERE is my application") == (
+            "check_status", {"query": "WHERE is my application"}
+        )
+
+    def test_registered_queries_are_frozen_and_normalized(self):
+        """Test that registered queries are stored as a frozenset of normalized strings."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        registry.register_special_queries("check_status", ["Check STATUS!", "check status"])
+
+        assert registry.special_queries["check_status"] == frozenset({normalize_query("Check STATUS!")})
+        assert isinstance(registry.special_queries["check_status"], frozenset)
+
+    def test_reregistering_queries_drops_old_entries(self):
+        """Test that registering queries again replaces the function's previous queries."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        registry.register_special_queries("check_status", ["old query"])
+        registry.register_special_queries("check_status", ["new query"])
+
+        assert registry.find_special_query_handler("old query") is None
+        assert registry.find_special_query_handler("new query")[0] == "check_status"
+
+    def test_duplicate_query_keeps_first_function(self, caplog):
+        """Test that a query registered for two functions stays with the first and warns."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        registry.register(lookup_course)
+        registry.register_special_queries("check_status", ["status please"])
+        registry.register_special_queries("lookup_course", ["Status, please!"])
+
+        assert registry.find_special_query_handler("status please")[0] == "check_status"
+        assert "already handled by check_status" in caplog.text
+
+    def test_pattern_match_checks_every_registered_pattern(self):
+        """Test that a query matching any one of a function's patterns is dispatched to it."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        registry.register_special_patterns("check_status", [r"track\s+my\s+application", r"(status|progress)\s+update"])
+
+        assert registry.find_special_query_handler("Any progress update?")[0] == "check_status"
+        assert registry.find_special_query_handler("How do I track my application")[0] == "check_status"
+        assert registry.find_special_query_handler("What are the fees?") is None
+
+    def test_patterns_with_group_references_matched_individually(self):
+        """Test that numbered backreferences keep referring to their own pattern's groups."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        registry.register_special_patterns("check_status", [r"(a)\1", r"(b)\1"])
+
+        assert registry._combined_patterns["check_status"] is None
+        assert registry.find_special_query_handler("bb")[0] == "check_status"
+        assert registry.find_special_query_handler("ab") is None
+
+    def test_patterns_that_cannot_be_combined(self):
+        """Test that inline global flags and repeated group names fall back to per-pattern search."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        registry.register(lookup_course)
+        registry.register_special_patterns("check_status", [r"(?i)fees", r"hostel"])
+        registry.register_special_patterns("lookup_course", [r"(?P<x>course)", r"(?P<x>program)"])
+
+        assert registry._combined_patterns["check_status"] is None
+        assert registry._combined_patterns["lookup_course"] is None
+        assert registry.find_special_query_handler("What are the fees?")[0] == "check_status"
+        assert registry.find_special_query_handler("Which program suits me?")[0] == "lookup_course"
+
+    def test_normalize_query_strips_punctuation(self):
+        """Test that ASCII and non-ASCII queries drop the same punctuation."""
+        registry = FunctionRegistry()
+
+        assert registry._normalize_query("  Can I raise a ticket?!  ") == "can i raise a ticket"
+        assert registry._normalize_query("My_ID: Müller, B.Tech") == "my_id müller btech"
+
+    def test_uppercase_literal_pattern_matches(self):
+        """Test that patterns with uppercase literals still match case-insensitively."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        registry.register_special_patterns("check_status", [r"Track\s+My\s+\S+ STATUS"])
+
+        assert registry.special_patterns["check_status"][0].pattern == r"Track\s+My\s+\S+ STATUS"
+        assert registry.find_special_query_handler("TRACK my Application status")[0] == "check_status"
+        assert registry.find_special_query_handler("track my   status") is None
+
+    def test_named_group_pattern(self):
+        """Test that named groups and named backreferences are left intact."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        registry.register_special_patterns("check_status", [r"(?P<word>again) (?P=word)"])
+
+        assert registry.find_special_query_handler("Again again, please")[0] == "check_status"
+        assert registry.find_special_query_handler("again once") is None
+
+    def test_lowercase_pattern_compiled_case_sensitively(self):
+        """Test that all-lowercase patterns skip re.IGNORECASE."""
+        registry = FunctionRegistry()
+        registry.register(check_status)
+        registry.register_special_patterns("check_status", [r"raise\s+a\s+query"])
+
+        assert not registry.special_patterns["check_status"][0].flags & re.IGNORECASE
+        assert registry.find_special_query_handler("Can I RAISE a query?")[0] == "check_status"
@@ -0,0 +1,66 @@
+"""
+Unit tests for the institution manager.
+"""
+import pytest
+from unittest.mock import patch
+
+from backend.institution_manager import InstitutionManager
+
+@pytest.mark.unit
+class TestProcessedPrompt:
+    """Test institution prompt rendering."""
+
+    def test_placeholders_replaced(self):
+        """Test that every placeholder is replaced with the institution's values."""
+        manager = InstitutionManager()
+        prompt = manager.get_processed_prompt("amity")
+
+        assert "{{" not in prompt
+        assert "**Academic Advisor** for **Amity University (AU)**" in prompt
+        assert "https://www.amity.edu" in prompt
+
+    def test_default_institution_used_without_id(self):
+        """Test that the default institution's prompt is returned when no ID is given."""
+        manager = InstitutionManager()
+
+        assert manager.get_processed_prompt() == manager.get_processed_prompt(manager.default_institution_id)
+
+    def test_prompts_rendered_once(self):
+        """Test that repeated requests return the prompt rendered at initialization."""
+        manager = InstitutionManager()
+
+        assert manager.get_processed_prompt("lpu") is manager.get_processed_prompt("lpu")
+
+    def test_unknown_institution_raises(self):
+        """Test that an unknown institution ID still raises ValueError."""
+        manager = InstitutionManager()
+
+        with pytest.raises(ValueError):
+            manager.get_processed_prompt("unknown")
+
+    def test_unknown_placeholders_left_untouched(self):
+        """Test that placeholders outside the institution fields are kept as-is."""
+        manager = InstitutionManager()
+        template = "{{ROLE}} at {{INSTITUTION_SHORT_NAME}}: {{RAISE_QUERY}} {{ROLE}}"
+
+        with patch.object(manager.prompt_templates, "standard_template", template):
+            rendered = manager._render_prompt("lpu")
+
+        assert rendered == "Career Counselor at LPU: {{RAISE_QUERY}} Career Counselor"
+
+@pytest.mark.unit
+class TestInstitutionDomain:
+    """Test institution domain lookup."""
+
+    def test_domain_derived_from_website(self):
+        """Test that the www. prefix is stripped from each institution's website host."""
+        manager = InstitutionManager()
+
+        assert manager.get_institution_domain("lpu") == "lpu.in"
+        assert manager.get_institution_domain("amity") == "amity.edu"
+
+    def test_unknown_institution_uses_default_domain(self):
+        """Test that unknown institutions fall back to the default domain."""
+        manager = InstitutionManager()
+
+        assert manager.get_institution_domain("unknown") == "lpu.in"
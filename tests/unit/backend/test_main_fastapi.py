@@ -0,0 +1,74 @@
+"""
+Unit tests for prompt building and LLM response streaming.
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+
+import backend.main_fastapi as main_fastapi
+from backend.main_fastapi import _build_prompt, _invoke_llm, _STREAM_FLUSH_CHARS
+from backend.ttl_cache import TTLCache
+
+@pytest.mark.unit
+class TestGetMemory:
+    """Test the in-memory session store."""
+
+    def test_session_ttl_slides_with_access(self):
+        """Test that a session touched before expiry survives past its original deadline."""
+        store = TTLCache(maxsize=10, ttl=10)
+        with patch.object(main_fastapi, "memory_store", store), \
+             patch.object(main_fastapi, "redis_client", None):
+            with patch("backend.ttl_cache.time.monotonic", return_value=100.0):
+                memory = main_fastapi.get_memory("session")
+            with patch("backend.ttl_cache.time.monotonic", return_value=108.0):
+                assert main_fastapi.get_memory("session") is memory
+            with patch("backend.ttl_cache.time.monotonic", return_value=115.0):
+                assert main_fastapi.get_memory("session") is memory
+            with patch("backend.ttl_cache.time.monotonic", return_value=130.0):
+                assert main_fastapi.get_memory("session") is not memory
+
+@pytest.mark.unit
+class TestBuildPrompt:
+    """Test prompt construction."""
+
+    def test_institution_template_in_system_prompt(self):
+        """Test that the institution template is in the shared system prompt, not the user prompt."""
+        memory = MagicMock()
+        memory.get_context.return_value = "No history"
+        context_data = {"retrieved_content": "Fees are listed online."}
+
+        first = _build_prompt("What are the fees?", memory, None, context_data, "amity")
+        second = _build_prompt("Where is the campus?", memory, {"name": "Asha"}, context_data, "amity")
+
+        assert first["system_prompt"] is second["system_prompt"]
+        assert "Amity University" in first["system_prompt"]
+        assert "Amity University" not in first["user_prompt"]
+        assert 'Please answer: "What are the fees?"' in first["user_prompt"]
+        assert "- name: Asha" in second["user_prompt"]
+
+def _stream(deltas):
+    async def generator():
+        for delta in deltas:
+            yield {"choices": [{"delta": {"content": delta}}]}
+    return generator()
+
+@pytest.mark.unit
+class TestInvokeLlm:
+    """Test streamed delta handling in _invoke_llm."""
+
+    @pytest.mark.asyncio
+    async def test_small_deltas_are_coalesced(self):
+        """Test that tiny deltas are merged into chunks and the full answer is kept intact."""
+        deltas = ["ab"] * _STREAM_FLUSH_CHARS + ["end"]
+        memory = MagicMock()
+        prompts = {"system_prompt": "system", "user_prompt": "user"}
+        context_data = {"references_raw": ""}
+
+        with patch("litellm.acompletion", return_value=_stream(deltas)), \
+             patch("backend.main_fastapi.cache_answer"):
+            result = await _invoke_llm(prompts, context_data, memory, "query")
+
+        contents = [chunk["content"] for chunk in result["responses"]]
+        assert "".join(contents) == "".join(deltas)
+        assert len(contents) < len(deltas)
+        assert all(len(content) >= _STREAM_FLUSH_CHARS for content in contents[:-1])
+        memory.add_interaction.assert_called_once_with("query", "".join(deltas))
@@ -0,0 +1,57 @@
+"""
+Unit tests for the TTL cache.
+"""
+import pytest
+from unittest.mock import patch
+
+from backend.ttl_cache import TTLCache
+
+@pytest.mark.unit
+class TestTTLCache:
+    """Test the bounded TTL cache."""
+
+    def test_set_and_get(self):
+        """Test storing and retrieving a value."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert "a" in cache
+        assert cache.get("missing", "default") == "default"
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted when full."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+        assert len(cache) == 2
+
+    def test_entries_expire(self):
+        """Test that entries are dropped once their TTL has passed."""
+        cache = TTLCache(maxsize=2, ttl=10)
+        with patch("backend.ttl_cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("backend.ttl_cache.time.monotonic", return_value=105.0):
+            assert cache.get("a") == 1
+        with patch("backend.ttl_cache.time.monotonic", return_value=111.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_clear(self):
+        """Test clearing the cache."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_item_access(self):
+        """Test dict-style item access, including KeyError for missing keys."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache["a"] = 1
+        assert cache["a"] == 1
+        with pytest.raises(KeyError):
+            cache["missing"]